@@ -3,7 +3,10 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-def plot_agriculture_insights(cleaned_data):
+from scatter_scaling import scale_scatter
+from trendlines import cached_fit, trendline_traces
+
+def plot_agriculture_insights(cleaned_data, data_version=None):
     # 1. Merge Economy + Geography
     # We need Real_GDP_per_Capita_USD from economy
     # And Agricultural_Land, Arable_Land, Permanent_Crops, Permanent_Pasture, Irrigated_Land from geography
@@ -78,16 +81,31 @@ def plot_agriculture_insights(cleaned_data):
     )
     
     # Plot 2: Scatter Plot - GDP vs Agricultural Land
+    # WebGL above WEBGL_THRESHOLD rows, server-side binning above AGGREGATE_THRESHOLD (scatter_scaling)
+    scatter_data, scatter_options = scale_scatter(
+        merged, "Real_GDP_per_Capita_USD", "Agricultural_Land", by="GDP_Group", log_x=True
+    )
     fig2 = px.scatter(
-        merged,
+        scatter_data,
         x="Real_GDP_per_Capita_USD",
         y="Agricultural_Land",
         hover_name="Country",
         color="GDP_Group",
         log_x=True,
         title="GDP per Capita vs. Agricultural Land (%)",
-        labels={"Real_GDP_per_Capita_USD": "GDP per Capita (Log Scale)", "Agricultural_Land": "Agricultural Land (%)"}
+        labels={"Real_GDP_per_Capita_USD": "GDP per Capita (Log Scale)", "Agricultural_Land": "Agricultural Land (%)"},
+        **scatter_options
+    )
+
+    # One fit over all countries, linear in log10(GDP) so it is a straight line on the log axis
+    fits = cached_fit(
+        (data_version, "gdp_vs_agricultural_land") if data_version else None,
+        merged["Real_GDP_per_Capita_USD"],
+        merged["Agricultural_Land"],
+        log_x=True
     )
+    if 0 in fits:
+        fig2.add_traces(trendline_traces(fits[0], "white", "All countries", showlegend=True))
     
     # Plot 4: Correlation Heatmap
     # Calculate correlation matrix for numeric columns
@@ -1,16 +1,22 @@
 import os
+from functools import lru_cache
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State, ClientsideFunction
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import requests
 import pycountry
+from flask import Response, redirect, request as flask_request
 
-from clean_data import load_and_clean_separate
+from data_cache import load_cleaned_cached
 from country_centers import country_center
 from energy_environment_plot import electricity_vs_poverty
 from agriculture_plots import plot_agriculture_insights
+from rank_index import build_rank_index
+from region_hierarchy import HOW_LABELS, LEVELS, build_hierarchy, default_how
+from vector_tiles import discrete_colorscale, load_click_shapes, load_manifests, register_tile_routes, tile_layers
+from view_state import canonical_state, data_version, encode_state, figure_body, figure_state, figure_version
 
 # Inject CSS
 os.makedirs("assets", exist_ok=True)
@@ -51,7 +57,7 @@ def sidebar_style(display="none"):
     }
 
 
-cleaned_data = load_and_clean_separate()
+cleaned_data = load_cleaned_cached()
 for df in cleaned_data.values():
     df["ISO3"] = df["Country"].apply(get_iso3)
 
@@ -62,6 +68,15 @@ datasets = {
     "geography": cleaned_data.get("geography", pd.DataFrame())
 }
 
+# Sorted value/rank arrays per numeric column, so the leaderboard never sorts per request
+rank_index = build_rank_index(datasets)
+
+# country -> sub-region -> continent -> world, with every metric rolled up at every level
+hierarchy = build_hierarchy(cleaned_data)
+
+# Content hash of the loaded data; keys the tile pyramids and the sidebar fit cache
+DATA_VERSION = data_version(datasets)
+
 all_countries = (
     pd.concat([
         datasets["energy"][["Country", "ISO3"]],
@@ -107,23 +122,48 @@ category_mapping = {
 
 geojson_url = "https://raw.githubusercontent.com/johan/world.geo.json/master/countries.geo.json"
 geojson = requests.get(geojson_url).json()
+features_by_iso = {feature.get("id"): feature for feature in geojson["features"]}
+known_isos = set(features_by_iso) | set(country_center)
+
+# Metrics with a pre-rendered vector-tile pyramid for the current data (built with `python vector_tiles.py`)
+tile_manifests = load_manifests(DATA_VERSION)
+click_shapes = load_click_shapes(DATA_VERSION)
+
+# Data, tiles and code together; part of every cacheable figure URL
+FIGURE_VERSION = figure_version(DATA_VERSION, tile_manifests if click_shapes else {})
+
+# Dataset dropdown options; the URL state accepts exactly these values
+dataset_options = [
+    {"label": "Choose a dataset", "value": "choose_dataset"},
+    {"label": "Energy", "value": "energy"},
+    {"label": "Demographics", "value": "demographics"},
+    {"label": "Economy", "value": "economy"},
+]
+dataset_values = [option["value"] for option in dataset_options]
 
 app = dash.Dash(__name__)
 app.title = "Global Data Dashboard"
+register_tile_routes(app.server)
 
 app.layout = html.Div(style={"backgroundColor": "#121212", "height": "100vh"}, children=[
+    # View state (dataset, category, selected ISO3) is mirrored into the query string
+    dcc.Location(id="url", refresh=False),
+    dcc.Store(id="selected-iso"),
+    dcc.Store(id="view-config", data={
+        "version": FIGURE_VERSION,
+        "datasets": dataset_values,
+        "categories": metric_categories,
+        "levels": list(LEVELS),
+        "isos": sorted(known_isos)
+    }),
+
     dcc.Graph(id="world-map", style={"height": "100%", "width": "100%"}),
 
     html.Div([
         html.Label("Dataset:", style={"color": "white"}),
         dcc.Dropdown(
             id="dataset-dropdown",
-            options=[
-                {"label": "Choose a dataset", "value": "choose_dataset"},
-                {"label": "Energy", "value": "energy"},
-                {"label": "Demographics", "value": "demographics"},
-                {"label": "Economy", "value": "economy"},
-            ],
+            options=dataset_options,
             value="choose_dataset",
             clearable=False
         ),
@@ -138,6 +178,14 @@ app.layout = html.Div(style={"backgroundColor": "#121212", "height": "100vh"}, c
             clearable=False
         ),
         html.Br(),
+        html.Label("Level:", style={"color": "white"}),
+        dcc.Dropdown(
+            id="level-dropdown",
+            options=[{"label": label, "value": level} for level, label in LEVELS.items()],
+            value="country",
+            clearable=False
+        ),
+        html.Br(),
         html.Button(
             "Reset Selection",
             id="reset-btn",
@@ -163,27 +211,42 @@ app.layout = html.Div(style={"backgroundColor": "#121212", "height": "100vh"}, c
         "zIndex": 1000
     }),
 
-    html.Div(id="sidebar", style=sidebar_style("none"))
+    html.Div(id="sidebar", style=sidebar_style("none"), children=[
+        html.Div(id="leaderboard"),
+        html.Div(id="sidebar-content")
+    ])
 ])
 
-@app.callback(
-    Output("world-map", "figure"),
-    Input("dataset-dropdown", "value"),
-    Input("metric-dropdown", "value"),
-    Input("world-map", "clickData"),
-    Input("reset-btn", "n_clicks")
-)
-def update_map(dataset_key, category, clickData, reset_clicks):
-    ctx = dash.callback_context
-    trigger = ctx.triggered[0]["prop_id"].split(".")[0] if ctx.triggered else None
+def tile_map(df, metric, manifest):
+    # Polygons are drawn by the vector-tile layers. On top sits an invisible choropleth of coarse
+    # outlines, so hover, clicks anywhere inside a country and the colorbar keep working.
+    values = df[["Country", "ISO3", metric]].dropna().drop_duplicates(subset=["ISO3"])
 
-    selected_iso = None
-    if trigger == "world-map" and clickData and "points" in clickData:
-        selected_iso = clickData["points"][0]["location"]
-    elif trigger == "reset-btn":
-        selected_iso = None
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=click_shapes,
+        locations=values["ISO3"],
+        z=values[metric],
+        text=values["Country"],
+        coloraxis="coloraxis",
+        marker_opacity=0.01,
+        hovertemplate="<b>%{text}</b><br>" + metric + "=%{z}<extra></extra>"
+    ))
+    fig.update_layout(
+        coloraxis=dict(
+            colorscale=discrete_colorscale(manifest),
+            cmin=manifest["min"],
+            cmax=manifest["max"],
+            colorbar=dict(tickvals=manifest["edges"], tickformat=".3s")
+        ),
+        mapbox_layers=tile_layers(manifest)
+    )
+    return fig
 
-    
+
+def build_map_figure(category, selected_iso=None, tiles=False, level="country"):
+    # Tile layers need the app's tile endpoint; without tiles the GeoJSON choropleth
+    # is used, which also keeps exported figures standalone.
+    # Above country level every country is coloured with its region's precomputed aggregate.
     if category == "choose_category":
         fig = px.choropleth_mapbox(
             all_countries,
@@ -222,18 +285,37 @@ def update_map(dataset_key, category, clickData, reset_clicks):
     if df is None or metric_to_use not in df.columns:
         return px.choropleth_mapbox()
 
-    fig = px.choropleth_mapbox(
-        df,
-        geojson=geojson,
-        locations="ISO3",
-        color=metric_to_use,
-        hover_name="Country",
-        color_continuous_scale="Sunset",
-        mapbox_style="carto-darkmatter",
-        zoom=1,
-        center={"lat": 20, "lon": 0},
-        opacity=0.75,
-    )
+    colorbar_title = metric_to_use
+    if level != "country":
+        rollup = hierarchy.rollup_frame(dataset_name, metric_to_use, level)
+        colorbar_title = f"{metric_to_use} ({HOW_LABELS.get(default_how(metric_to_use), 'not rolled up')}, {LEVELS[level]})"
+        fig = px.choropleth_mapbox(
+            rollup,
+            geojson=geojson,
+            locations="ISO3",
+            color=metric_to_use,
+            hover_name="Region",
+            color_continuous_scale="Sunset",
+            mapbox_style="carto-darkmatter",
+            zoom=1,
+            center={"lat": 20, "lon": 0},
+            opacity=0.75,
+        )
+    elif tiles and click_shapes and metric_to_use in tile_manifests:
+        fig = tile_map(df, metric_to_use, tile_manifests[metric_to_use])
+    else:
+        fig = px.choropleth_mapbox(
+            df,
+            geojson=geojson,
+            locations="ISO3",
+            color=metric_to_use,
+            hover_name="Country",
+            color_continuous_scale="Sunset",
+            mapbox_style="carto-darkmatter",
+            zoom=1,
+            center={"lat": 20, "lon": 0},
+            opacity=0.75,
+        )
     fig.update_layout(
         margin=dict(l=0, r=0, t=0, b=0),
         font_color="white",
@@ -246,13 +328,13 @@ def update_map(dataset_key, category, clickData, reset_clicks):
             center={"lat": 20, "lon": 0}
         )
     )
-    fig.update_traces(marker_line_width=0.4, marker_line_color="#222")
+    fig.update_traces(marker_line_width=0.4, marker_line_color="#222", selector=dict(type="choroplethmapbox"))
 
     # Legend at bottom-right
     fig.update_coloraxes(
         showscale=True,
         colorbar=dict(
-            title=dict(text=metric_to_use, font=dict(color="white", size=14)),
+            title=dict(text=colorbar_title, font=dict(color="white", size=14)),
             tickfont=dict(color="white"),
             bgcolor="rgba(0,0,0,0)",
             orientation="h",
@@ -265,9 +347,11 @@ def update_map(dataset_key, category, clickData, reset_clicks):
     )
 
     if selected_iso:
+        # Only ship the selected polygon instead of the full world geojson a second time
+        selected_features = [features_by_iso[selected_iso]] if selected_iso in features_by_iso else []
         fig.add_trace(
             go.Choroplethmapbox(
-                geojson=geojson,
+                geojson={"type": "FeatureCollection", "features": selected_features},
                 locations=[selected_iso],
                 z=[1],
                 colorscale=[[0, "rgba(255,0,0,0.35)"], [1, "rgba(255,0,0,0.35)"]],
@@ -283,11 +367,74 @@ def update_map(dataset_key, category, clickData, reset_clicks):
             )
 
     return fig
+
+
+# -------------------------------------------------
+# Cacheable map figures
+# -------------------------------------------------
+@lru_cache(maxsize=256)
+def cached_map_body(category, selected_iso, tiles, level="country"):
+    return figure_body(build_map_figure(category, selected_iso, tiles, level))
+
+
+@app.server.route("/figures/<version>/map.json")
+def map_figure(version):
+    state = figure_state(canonical_state(flask_request.args, dataset_values, category_mapping, known_isos, LEVELS))
+    query = encode_state(state)
+
+    # Old versions and non-canonical spellings redirect to the one URL a cache should store
+    if version != FIGURE_VERSION or flask_request.query_string.decode() != query:
+        return redirect(f"/figures/{FIGURE_VERSION}/map.json?{query}", code=302 if version != FIGURE_VERSION else 301)
+
+    body, etag = cached_map_body(
+        state.get("category", "choose_category"),
+        state.get("iso"),
+        True,
+        state.get("level", "country")
+    )
+    if etag in flask_request.if_none_match:
+        return Response(status=304)
+    response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+# -------------------------------------------------
+# View state callbacks (run in the browser, see assets/view_state.js)
+# -------------------------------------------------
+app.clientside_callback(
+    ClientsideFunction(namespace="view_state", function_name="sync_view"),
+    Output("url", "search"),
+    Output("dataset-dropdown", "value"),
+    Output("metric-dropdown", "value"),
+    Output("level-dropdown", "value"),
+    Output("selected-iso", "data"),
+    Input("url", "search"),
+    Input("dataset-dropdown", "value"),
+    Input("metric-dropdown", "value"),
+    Input("level-dropdown", "value"),
+    Input("world-map", "clickData"),
+    Input("reset-btn", "n_clicks"),
+    State("selected-iso", "data"),
+    State("view-config", "data")
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="view_state", function_name="fetch_map"),
+    Output("world-map", "figure"),
+    Input("metric-dropdown", "value"),
+    Input("level-dropdown", "value"),
+    Input("selected-iso", "data"),
+    State("view-config", "data")
+)
+
+
 # -------------------------------------------------
 # Sidebar callback
 # -------------------------------------------------
 @app.callback(
-    Output("sidebar", "children"),
+    Output("sidebar-content", "children"),
     Output("sidebar", "style"),
     Input("metric-dropdown", "value"),
     Input("reset-btn", "n_clicks")
@@ -302,12 +449,12 @@ def toggle_sidebar(category, reset_clicks):
 
     # If Energy & Environment selected, show correlation plot
     if category == "Energy & Environment":
-        fig = electricity_vs_poverty(cleaned_data)
+        fig = electricity_vs_poverty(cleaned_data, DATA_VERSION, hierarchy)
         return [dcc.Graph(figure=fig, style={"height": "100%", "width": "100%"})], sidebar_style("block")
 
     # If Agriculture & Economy selected, show agriculture plots
     if category == "Agriculture & Economy":
-        figures = plot_agriculture_insights(cleaned_data)
+        figures = plot_agriculture_insights(cleaned_data, DATA_VERSION)
         
         # Create Tabs
         tabs = dcc.Tabs([
@@ -330,6 +477,71 @@ def toggle_sidebar(category, reset_clicks):
     return [], sidebar_style("block")
 
 
+# -------------------------------------------------
+# Leaderboard callback
+# -------------------------------------------------
+def format_value(value):
+    return f"{value:,.2f}" if abs(value) < 1000 else f"{value:,.0f}"
+
+
+def leaderboard_table(rows, index):
+    # Tied countries show the same rank
+    return html.Table([
+        html.Tr([html.Td(f"#{index.rank(row['ISO3'])['rank']}"), html.Td(row["country"]), html.Td(format_value(row["value"]))])
+        for row in rows
+    ], style={"width": "100%", "fontSize": "13px"})
+
+
+@app.callback(
+    Output("leaderboard", "children"),
+    Input("metric-dropdown", "value"),
+    Input("selected-iso", "data")
+)
+def update_leaderboard(category, selected_iso):
+    if category not in category_mapping:
+        return []
+
+    children = []
+
+    # Where the selected country stands on every metric of the category
+    if selected_iso:
+        rows = []
+        country_name = selected_iso
+        for section in category_mapping[category]:
+            for metric in section["metrics"]:
+                index = rank_index.get((section["dataset"], metric))
+                position = index.rank(selected_iso) if index else None
+                if position is None:
+                    rows.append(html.Tr([html.Td(metric), html.Td("no data", colSpan=3)]))
+                    continue
+                country_name = position["country"]
+                rows.append(html.Tr([
+                    html.Td(metric),
+                    html.Td(format_value(position["value"])),
+                    html.Td(f"#{position['rank']} of {position['of']}"),
+                    html.Td(f"percentile {position['percentile']:.0f}")
+                ]))
+        children += [
+            html.H4(f"Where {country_name} stands"),
+            html.Table(rows, style={"width": "100%", "fontSize": "13px"})
+        ]
+
+    # Top and bottom countries on the category's map metric
+    first_section = category_mapping[category][0]
+    index = rank_index.get((first_section["dataset"], first_section["metrics"][0]))
+    if index is not None and index.n:
+        children += [
+            html.H4(f"Leaderboard: {index.metric}"),
+            html.Div("Top 5", style={"fontWeight": "bold"}),
+            leaderboard_table(index.top(5), index),
+            html.Div("Bottom 5", style={"fontWeight": "bold"}),
+            leaderboard_table(index.bottom(5), index),
+            html.Hr()
+        ]
+
+    return children
+
+
 # -------------------------------------------------
 # Run app
 # -------------------------------------------------
@@ -0,0 +1,63 @@
+// Keeps the dashboard view state (dataset, category, level, selected ISO3) in the query string
+// and loads the map figure from its cacheable, content-addressed URL.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    view_state: {
+        sync_view: function(search, dataset, category, level, clickData, resetClicks, selectedIso, config) {
+            var ctx = window.dash_clientside.callback_context;
+            var noUpdate = window.dash_clientside.no_update;
+            var trigger = ctx.triggered.length ? ctx.triggered[0].prop_id.split(".")[0] : "";
+            var newDataset = dataset;
+            var newCategory = category;
+            var newLevel = level;
+            var iso = selectedIso || null;
+
+            if (trigger === "url" || trigger === "") {
+                // Page load or back/forward navigation: the URL wins
+                var params = new URLSearchParams(search || "");
+                newDataset = params.get("dataset");
+                newCategory = params.get("category");
+                newLevel = params.get("level");
+                iso = params.get("iso") ? params.get("iso").toUpperCase() : null;
+                if (config.datasets.indexOf(newDataset) === -1) newDataset = "choose_dataset";
+                if (config.categories.indexOf(newCategory) === -1) newCategory = "choose_category";
+                if (config.levels.indexOf(newLevel) === -1) newLevel = "country";
+                if (iso && config.isos.indexOf(iso) === -1) iso = null;
+            } else if (trigger === "world-map" && clickData && clickData.points) {
+                var point = clickData.points[0];
+                iso = point.location || null;
+            } else if (trigger === "reset-btn") {
+                iso = null;
+            }
+
+            // Same canonical form as view_state.encode_state: sorted keys, defaults left out
+            var canonical = new URLSearchParams();
+            if (newCategory !== "choose_category") canonical.append("category", newCategory);
+            if (newDataset !== "choose_dataset") canonical.append("dataset", newDataset);
+            if (iso) canonical.append("iso", iso);
+            if (newLevel !== "country") canonical.append("level", newLevel);
+            var newSearch = canonical.toString() ? "?" + canonical.toString() : "";
+
+            return [
+                newSearch === (search || "") ? noUpdate : newSearch,
+                newDataset === dataset ? noUpdate : newDataset,
+                newCategory === category ? noUpdate : newCategory,
+                newLevel === level ? noUpdate : newLevel,
+                iso === selectedIso ? noUpdate : iso
+            ];
+        },
+
+        fetch_map: function(category, level, selectedIso, config) {
+            var params = new URLSearchParams();
+            if (category && category !== "choose_category") params.append("category", category);
+            if (selectedIso) params.append("iso", selectedIso);
+            if (level && level !== "country") params.append("level", level);
+            return fetch("/figures/" + config.version + "/map.json?" + params.toString())
+                .then(function(response) {
+                    if (!response.ok) {
+                        throw new Error("Map figure request failed: " + response.status);
+                    }
+                    return response.json();
+                });
+        }
+    }
+});
@@ -0,0 +1,37 @@
+import hashlib
+import inspect
+import os
+import pickle
+
+from clean_data import load_and_clean_separate
+
+DATA_DIR = "CIA Global Statistical Database"
+CACHE_DIR = ".cache"
+
+
+def source_hash(data_dir=DATA_DIR):
+    # Changes whenever a CSV or the cleaning code changes
+    digest = hashlib.sha256()
+    paths = sorted(os.path.join(data_dir, name) for name in os.listdir(data_dir) if name.endswith(".csv"))
+    paths.append(inspect.getsourcefile(load_and_clean_separate))
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def load_cleaned_cached(data_dir=DATA_DIR, cache_dir=CACHE_DIR):
+    # load_and_clean_separate() is slow; keep its result on disk keyed by the inputs
+    path = os.path.join(cache_dir, f"cleaned_{source_hash(data_dir)}.pkl")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    cleaned = load_and_clean_separate()
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(cleaned, f)
+    os.replace(tmp_path, path)
+    return cleaned
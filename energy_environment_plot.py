@@ -1,8 +1,11 @@
 import pandas as pd
 import plotly.express as px
-import country_converter as coco
 
-def electricity_vs_poverty(cleaned_data):
+from region_hierarchy import build_hierarchy
+from scatter_scaling import scale_scatter
+from trendlines import cached_fit, trendline_traces
+
+def electricity_vs_poverty(cleaned_data, data_version=None, hierarchy=None):
     # Merge economy + energy + demographics
     merged = pd.merge(
         cleaned_data["economy"][["Country", "Population_Below_Poverty_Line_percent"]],
@@ -18,13 +21,12 @@ def electricity_vs_poverty(cleaned_data):
 
     merged["Total_Population"] = pd.to_numeric(merged["Total_Population"], errors="coerce")
 
-    # Drop invalid entries
-    invalid_entries = ["WORLD","EUROPEAN UNION","ARCTIC OCEAN","ATLANTIC OCEAN","INDIAN OCEAN","PACIFIC OCEAN"]
-    merged = merged[~merged["Country"].str.upper().isin([x.upper() for x in invalid_entries])]
-
-    # Add continent
-    cc = coco.CountryConverter()
-    merged["Region"] = cc.convert(names=merged["Country"], to="continent")
+    # Add continent from the region hierarchy; pseudo-entities (WORLD, EUROPEAN UNION, oceans)
+    # are not part of it and drop out
+    if hierarchy is None:
+        hierarchy = build_hierarchy(cleaned_data)
+    merged["Region"] = hierarchy.region_of(merged["Country"], "continent")
+    merged = merged.dropna(subset=["Region"])
 
     # Bin population
     bins = [0, 10_000_000, 50_000_000, 200_000_000, 1_500_000_000]
@@ -38,9 +40,19 @@ def electricity_vs_poverty(cleaned_data):
         "Total_Population"
     ])
 
-    # Plotly scatter with regression trendline
-    fig = px.scatter(
+    # WebGL above WEBGL_THRESHOLD points, binned points above AGGREGATE_THRESHOLD (scatter_scaling);
+    # trendlines still use every row
+    plot_data, scatter_options = scale_scatter(
         merged,
+        "Population_Below_Poverty_Line_percent",
+        "electricity_access_percent",
+        by="Region",
+        size="Total_Population"
+    )
+
+    # Plotly scatter; trendlines are added below without going through statsmodels
+    fig = px.scatter(
+        plot_data,
         x="Population_Below_Poverty_Line_percent",
         y="electricity_access_percent",
         color="Region",
@@ -48,13 +60,26 @@ def electricity_vs_poverty(cleaned_data):
         hover_name="Country",
         facet_col="Region",
         facet_col_wrap=2,   # fewer plots per row for readability
-        # trendline="ols",
         labels={
             "Population_Below_Poverty_Line_percent": "Population Below Poverty Line (%)",
             "electricity_access_percent": "Electricity Access (%)"
         },
-        title="Electricity Access vs Poverty Levels by Region"
+        title="Electricity Access vs Poverty Levels by Region",
+        **scatter_options
+    )
+
+    # Population-weighted least-squares fit per Region, drawn on the facet of that Region
+    fits = cached_fit(
+        (data_version, "electricity_vs_poverty") if data_version else None,
+        merged["Population_Below_Poverty_Line_percent"],
+        merged["electricity_access_percent"],
+        groups=merged["Region"],
+        weights=merged["Total_Population"]
     )
+    for trace in list(fig.data):
+        if trace.name in fits:
+            fig.add_traces(trendline_traces(fits[trace.name], trace.marker.color, trace.name,
+                                            xaxis=trace.xaxis, yaxis=trace.yaxis))
 
     # Taller figure so each facet has space
     fig.update_layout(template="plotly_dark", legend_title="Region", height=900)
@@ -0,0 +1,183 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from data_cache import load_cleaned_cached
+from slugs import metric_slug
+
+REPORT_DIR = "reports"
+# Aggregates rather than countries; kept out of distributions like exclude_world in the notebook
+PSEUDO_COUNTRIES = ["WORLD", "EUROPEAN UNION"]
+
+
+def report_code_hash():
+    # Changes whenever the report code itself changes, so edited reports are rebuilt
+    with open(inspect.getsourcefile(column_report), "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def frame_hash(df, code_hash):
+    # Input hash of one output: report code, column names and row values
+    digest = hashlib.sha256()
+    digest.update(code_hash.encode())
+    digest.update(json.dumps([str(c) for c in df.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+# -------------------------------------------------
+# Work units (run in the process pool)
+# -------------------------------------------------
+def column_report(domain, column, data, out_dir):
+    # Distribution, summary statistics, extreme values and z-score outliers of one column
+    values = data[column]
+    valid = data.dropna(subset=[column])
+    z_scores = (values - values.mean()) / values.std()
+    summary = {
+        "domain": domain,
+        "column": column,
+        "describe": {k: float(v) for k, v in values.describe().items()},
+        "nans": int(values.isna().sum()),
+        "largest": valid.nlargest(5, column)[["Country", column]].values.tolist(),
+        "smallest": valid.nsmallest(5, column)[["Country", column]].values.tolist(),
+        "outliers_z3": valid.loc[z_scores.abs() > 3, "Country"].tolist()
+    }
+
+    fig = px.histogram(data, x=column, nbins=50, hover_data=["Country"], title=f"{domain}: {column}")
+    fig.update_layout(template="plotly_dark")
+
+    base = os.path.join(out_dir, "columns", metric_slug(column))
+    fig.write_html(base + ".html", include_plotlyjs="cdn")
+    with open(base + ".json", "w") as f:
+        json.dump(summary, f, indent=2, default=str)
+    return base
+
+
+def pair_report(domain, x, y, data, out_dir):
+    # Scatter of two columns with their Pearson and Spearman correlation
+    pair = data.dropna(subset=[x, y])
+    pearson = pair[x].corr(pair[y]) if len(pair) > 2 else np.nan
+    # Spearman as Pearson on ranks, which avoids pulling in scipy
+    spearman = pair[x].rank().corr(pair[y].rank()) if len(pair) > 2 else np.nan
+
+    fig = px.scatter(
+        pair, x=x, y=y, hover_name="Country",
+        title=f"{domain}: {x} vs {y} (pearson {pearson:.2f}, spearman {spearman:.2f}, n={len(pair)})"
+    )
+    fig.update_layout(template="plotly_dark")
+
+    base = os.path.join(out_dir, "pairs", f"{metric_slug(x)}__{metric_slug(y)}")
+    fig.write_html(base + ".html", include_plotlyjs="cdn")
+    return base
+
+
+def domain_overview(domain, data, numeric, out_dir):
+    # Missingness per column and per country, and the correlation matrix
+    nan_per_column = data.isna().sum().sort_values()
+    nan_per_country = data.set_index("Country").isna().sum(axis=1).sort_values()
+    with open(os.path.join(out_dir, "missingness.json"), "w") as f:
+        json.dump({"per_column": nan_per_column.to_dict(), "per_country": nan_per_country.to_dict()}, f, indent=2)
+
+    fig = px.bar(x=nan_per_column.index, y=nan_per_column.values, title=f"{domain}: NaNs per column",
+                 labels={"x": "Column", "y": "NaNs"})
+    fig.update_layout(template="plotly_dark")
+    fig.write_html(os.path.join(out_dir, "missingness.html"), include_plotlyjs="cdn")
+
+    if len(numeric) > 1:
+        fig = px.imshow(data[numeric].corr(), text_auto=".2f", aspect="auto", zmin=-1, zmax=1,
+                        color_continuous_scale="RdBu_r", title=f"{domain}: correlation matrix")
+        fig.update_layout(template="plotly_dark")
+        fig.write_html(os.path.join(out_dir, "correlation.html"), include_plotlyjs="cdn")
+    return os.path.join(out_dir, "missingness")
+
+
+# -------------------------------------------------
+# Pipeline
+# -------------------------------------------------
+def plan_tasks(cleaned_data, out_dir, include_pairs=True):
+    # (output key, input hash, output file, function, args) for every output of every domain
+    tasks = []
+    code_hash = report_code_hash()
+    for domain, df in sorted(cleaned_data.items()):
+        if df.empty or "Country" not in df.columns:
+            continue
+        data = df[~df["Country"].str.upper().isin(PSEUDO_COUNTRIES)].reset_index(drop=True)
+        numeric = [c for c in data.select_dtypes(include="number").columns if data[c].notna().any()]
+        domain_dir = os.path.join(out_dir, domain)
+
+        tasks.append((f"{domain}/overview", frame_hash(data, code_hash), os.path.join(domain_dir, "missingness.html"),
+                      domain_overview, (domain, data, numeric, domain_dir)))
+        for column in numeric:
+            subset = data[["Country", column]]
+            tasks.append((f"{domain}/columns/{column}", frame_hash(subset, code_hash),
+                          os.path.join(domain_dir, "columns", metric_slug(column) + ".html"),
+                          column_report, (domain, column, subset, domain_dir)))
+        if include_pairs:
+            for x, y in combinations(numeric, 2):
+                subset = data[["Country", x, y]]
+                tasks.append((f"{domain}/pairs/{x}__{y}", frame_hash(subset, code_hash),
+                              os.path.join(domain_dir, "pairs", f"{metric_slug(x)}__{metric_slug(y)}.html"),
+                              pair_report, (domain, x, y, subset, domain_dir)))
+    return tasks
+
+
+def run(out_dir=REPORT_DIR, workers=None, include_pairs=True, force=False):
+    start = time.perf_counter()
+    cleaned_data = load_cleaned_cached()
+
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    tasks = plan_tasks(cleaned_data, out_dir, include_pairs)
+    # Only outputs whose input data changed (or whose file is gone) are rebuilt
+    stale = [task for task in tasks if manifest.get(task[0]) != task[1] or not os.path.exists(task[2])]
+    for domain in cleaned_data:
+        for sub in ("columns", "pairs"):
+            os.makedirs(os.path.join(out_dir, domain, sub), exist_ok=True)
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(func, *args): (key, input_hash) for key, input_hash, _, func, args in stale}
+        for future, (key, input_hash) in futures.items():
+            try:
+                future.result()
+                manifest[key] = input_hash
+            except Exception as e:
+                failed += 1
+                print(f"Failed: {key}: {e}")
+
+    # Outputs for columns that no longer exist are dropped from the manifest
+    current = {task[0] for task in tasks}
+    manifest = {key: value for key, value in manifest.items() if key in current}
+    os.makedirs(out_dir, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    print(f"{len(stale) - failed} outputs regenerated, {len(tasks) - len(stale)} up to date, "
+          f"{failed} failed in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Batch version of JBI100_Data_Exploration.ipynb: distributions, missingness and "
+                    "pairwise views for every domain CSV."
+    )
+    parser.add_argument("--out", default=REPORT_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--no-pairs", action="store_true", help="skip the pairwise scatter views")
+    parser.add_argument("--force", action="store_true", help="regenerate every output")
+    args = parser.parse_args()
+
+    run(args.out, args.workers, not args.no_pairs, args.force)
@@ -0,0 +1,141 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.io as pio
+
+from slugs import metric_slug
+
+EXPORT_DIR = "exports"
+
+
+def collect_views():
+    # (name, figure JSON bytes, build seconds, shared build) for every view in the dashboard.
+    # Views built together by one call carry that call's total time and its name as shared build.
+    # Imported here so pool workers do not load the data and geojson again.
+    from agriculture_plots import plot_agriculture_insights
+    from app import DATA_VERSION, cached_map_body, cleaned_data, hierarchy, metric_categories
+    from region_hierarchy import LEVELS
+    from energy_environment_plot import electricity_vs_poverty
+    from view_state import figure_body
+
+    views = []
+
+    def timed(name, build):
+        start = time.perf_counter()
+        body = build()
+        views.append((name, body, time.perf_counter() - start, None))
+
+    # Map views come from the same LRU that backs /figures/<version>/map.json
+    timed("map/world", lambda: cached_map_body("choose_category", None, False)[0])
+    for category in metric_categories:
+        timed(f"map/{metric_slug(category)}", lambda category=category: cached_map_body(category, None, False)[0])
+        for level in LEVELS:
+            if level != "country":
+                timed(f"map/by_{level}/{metric_slug(category)}",
+                      lambda category=category, level=level: cached_map_body(category, None, False, level)[0])
+
+    timed("sidebar/energy_facets",
+          lambda: figure_body(electricity_vs_poverty(cleaned_data, DATA_VERSION, hierarchy))[0])
+
+    # The three agriculture tabs come out of one call, so they can only be timed together
+    start = time.perf_counter()
+    agriculture = plot_agriculture_insights(cleaned_data, DATA_VERSION)
+    bodies = {tab: figure_body(agriculture[tab])[0] for tab in ("bar", "heatmap", "scatter")}
+    build_time = time.perf_counter() - start
+    for tab, body in bodies.items():
+        views.append((f"sidebar/agriculture_{tab}", body, build_time, "sidebar/agriculture"))
+    return views
+
+
+def render_view(name, body, out_dir, formats):
+    # Runs in a pool worker: write one figure to every requested format
+    start = time.perf_counter()
+    fig = pio.from_json(body.decode())
+    base = os.path.join(out_dir, name)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    written = []
+    for fmt in formats:
+        path = f"{base}.{fmt}"
+        if fmt == "html":
+            # plotly.min.js is written once per directory so the pages work offline
+            fig.write_html(path, include_plotlyjs="directory")
+        else:
+            fig.write_image(path, width=1600, height=900)
+        written.append(path)
+    return written, time.perf_counter() - start
+
+
+def image_export_available():
+    try:
+        import kaleido  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def run(out_dir=EXPORT_DIR, formats=("html", "png"), workers=None, force=False):
+    formats = list(formats)
+    if any(fmt != "html" for fmt in formats) and not image_export_available():
+        print("kaleido is not installed; exporting HTML only")
+        formats = [fmt for fmt in formats if fmt == "html"]
+
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    views = collect_views()
+
+    # A view is skipped when its figure content and the requested formats are unchanged
+    jobs = []
+    results = {}
+    for name, body, build_time, _ in views:
+        digest = hashlib.sha256(body + ",".join(formats).encode()).hexdigest()[:16]
+        outputs = [os.path.join(out_dir, f"{name}.{fmt}") for fmt in formats]
+        if manifest.get(name) == digest and all(os.path.exists(path) for path in outputs):
+            results[name] = (build_time, None, "unchanged")
+        else:
+            jobs.append((name, body, build_time, digest))
+
+    os.makedirs(out_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_view, name, body, out_dir, formats): (name, build_time, digest)
+                   for name, body, build_time, digest in jobs}
+        for future, (name, build_time, digest) in futures.items():
+            try:
+                _, render_time = future.result()
+                manifest[name] = digest
+                results[name] = (build_time, render_time, "rendered")
+            except Exception as e:
+                results[name] = (build_time, None, f"failed: {e}")
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    print(f"{'view':<45} {'build ms':>9} {'render ms':>10}  status")
+    shared_builds = []
+    for name, _, _, shared in views:
+        build_time, render_time, status = results[name]
+        render = f"{render_time * 1000:>10.0f}" if render_time is not None else f"{'-':>10}"
+        build = f"{build_time * 1000:>8.0f}*" if shared else f"{build_time * 1000:>9.0f}"
+        print(f"{name:<45} {build} {render}  {status}")
+        if shared and shared not in shared_builds:
+            shared_builds.append(shared)
+    for shared in shared_builds:
+        print(f"* one build of {shared}, shared by all of its views")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export every dashboard view to standalone HTML and images.")
+    parser.add_argument("--out", default=EXPORT_DIR)
+    parser.add_argument("--formats", nargs="+", default=["html", "png"], help="html and/or image formats (png, svg, pdf)")
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-render unchanged views")
+    args = parser.parse_args()
+
+    run(args.out, args.formats, args.workers, args.force)
@@ -0,0 +1,254 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import numpy as np
+import requests
+
+from country_centers import country_center
+
+# Values the dropdowns in app.py can take
+DATASETS = ["choose_dataset", "energy", "demographics", "economy"]
+CATEGORIES = [
+    "choose_category",
+    "Energy & Environment",
+    "Development & Poverty",
+    "Digital & Infrastructure Economy",
+    "Demographics & Labor",
+    "Agriculture & Economy"
+]
+LEVELS = ["country", "subregion", "continent", "world"]
+ISO3_CODES = list(country_center.keys())
+
+
+# -------------------------------------------------
+# Requests the browser makes
+# -------------------------------------------------
+def map_request(state):
+    # The map figure is fetched from its canonical URL by assets/view_state.js
+    query = {}
+    if state["category"] != "choose_category":
+        query["category"] = state["category"]
+    if state["iso"]:
+        query["iso"] = state["iso"]
+    if state["level"] != "country":
+        query["level"] = state["level"]
+    return "GET", f"/figures/{state['figure_version']}/map.json?{urlencode(sorted(query.items()))}", None
+
+
+def sidebar_request(state, changed):
+    # Mirrors the inputs of toggle_sidebar in app.py
+    return "POST", "/_dash-update-component", {
+        "output": "..sidebar-content.children...sidebar.style..",
+        "outputs": [
+            {"id": "sidebar-content", "property": "children"},
+            {"id": "sidebar", "property": "style"}
+        ],
+        "inputs": [
+            {"id": "metric-dropdown", "property": "value", "value": state["category"]},
+            {"id": "reset-btn", "property": "n_clicks", "value": state["reset_clicks"]}
+        ],
+        "changedPropIds": [changed],
+        "state": []
+    }
+
+
+def leaderboard_request(state, changed):
+    # Mirrors the inputs of update_leaderboard in app.py
+    return "POST", "/_dash-update-component", {
+        "output": "leaderboard.children",
+        "outputs": {"id": "leaderboard", "property": "children"},
+        "inputs": [
+            {"id": "metric-dropdown", "property": "value", "value": state["category"]},
+            {"id": "selected-iso", "property": "data", "value": state["iso"]}
+        ],
+        "changedPropIds": [changed],
+        "state": []
+    }
+
+
+def next_action(state, rng):
+    # Pick a user interaction and return the server requests the browser would make for it
+    # as (callback_type, (method, path, payload)) pairs. The dataset dropdown only changes
+    # the URL in the browser, so it costs the server nothing.
+    roll = rng.random()
+    if roll < 0.2:
+        state["dataset"] = rng.choice(DATASETS)
+        return []
+    if roll < 0.3:
+        state["level"] = rng.choice(LEVELS)
+        return [("map:level", map_request(state))]
+    if roll < 0.5:
+        state["category"] = rng.choice(CATEGORIES)
+        return [
+            ("map:category", map_request(state)),
+            ("sidebar:category", sidebar_request(state, "metric-dropdown.value")),
+            ("leaderboard:category", leaderboard_request(state, "metric-dropdown.value"))
+        ]
+    if roll < 0.9:
+        state["iso"] = rng.choice(ISO3_CODES)
+        return [
+            ("map:click", map_request(state)),
+            ("leaderboard:click", leaderboard_request(state, "selected-iso.data"))
+        ]
+    state["reset_clicks"] += 1
+    state["iso"] = None
+    return [
+        ("map:reset", map_request(state)),
+        ("sidebar:reset", sidebar_request(state, "reset-btn.n_clicks")),
+        ("leaderboard:reset", leaderboard_request(state, "selected-iso.data"))
+    ]
+
+
+# -------------------------------------------------
+# Server process
+# -------------------------------------------------
+def start_server(port):
+    # Run the app without the debug reloader so the RSS we read is the serving process
+    # Server output goes to a log file (not a pipe, which would block once full) so startup
+    # tracebacks can be shown
+    code = "from app import app; app.run(debug=False, port={}, threaded=True)".format(port)
+    log = tempfile.NamedTemporaryFile(prefix="load_test_server_", suffix=".log", delete=False)
+    proc = subprocess.Popen(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=log,
+        stderr=subprocess.STDOUT
+    )
+    proc.log_path = log.name
+    base_url = "http://127.0.0.1:{}".format(port)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            with open(log.name) as f:
+                output = f.read()
+            raise RuntimeError("App exited during startup with code {}:\n{}".format(proc.returncode, output[-4000:]))
+        try:
+            requests.get(base_url + "/_dash-layout", timeout=1)
+            return proc, base_url
+        except requests.ConnectionError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("App did not start within 120 seconds, see {}".format(log.name))
+
+
+def read_rss_mb(pid):
+    # Linux only; returns None where /proc is not available
+    try:
+        with open("/proc/{}/status".format(pid)) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+# -------------------------------------------------
+# Sessions
+# -------------------------------------------------
+def figure_version(base_url):
+    # Version in the figure URLs (a hash of data, tile manifests and build id, not the data version
+    # alone); any version redirects to the current one
+    response = requests.get(base_url + "/figures/current/map.json", allow_redirects=False, timeout=10)
+    return response.headers["Location"].split("/")[2]
+
+
+def run_session(session_id, base_url, pid, figure_version, actions, think_time, seed, results, lock):
+    rng = random.Random(seed + session_id)
+    http = requests.Session()
+    state = {"dataset": "choose_dataset", "category": "choose_category", "level": "country", "iso": None,
+             "reset_clicks": 0, "figure_version": figure_version}
+
+    for _ in range(actions):
+        for callback_type, (method, path, payload) in next_action(state, rng):
+            start = time.perf_counter()
+            try:
+                response = http.request(method, base_url + path, json=payload, timeout=60)
+                ok = response.status_code in (200, 204)
+            except requests.RequestException:
+                ok = False
+            latency = time.perf_counter() - start
+            rss = read_rss_mb(pid)
+            with lock:
+                results.append((callback_type, latency, ok, rss))
+        if think_time:
+            time.sleep(rng.uniform(0, think_time))
+
+
+def summarize(results, wall_time):
+    print(f"{'callback':<22} {'n':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'req/s':>8} {'errors':>7} {'RSS MB':>8}")
+    for callback_type in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == callback_type]
+        latencies = np.array([r[1] for r in rows]) * 1000
+        errors = sum(1 for r in rows if not r[2])
+        rss = [r[3] for r in rows if r[3] is not None]
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        peak_rss = f"{max(rss):.0f}" if rss else "n/a"
+        print(f"{callback_type:<22} {len(rows):>6} {p50:>8.1f} {p90:>8.1f} {p99:>8.1f} "
+              f"{len(rows) / wall_time:>8.1f} {errors / len(rows):>7.1%} {peak_rss:>8}")
+
+    errors = sum(1 for r in results if not r[2])
+    print("-" * 84)
+    print(f"Total requests: {len(results)}  Wall time: {wall_time:.1f}s  "
+          f"Throughput: {len(results) / wall_time:.1f} req/s  Error rate: {errors / max(len(results), 1):.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard sessions against a local app instance.")
+    parser.add_argument("--sessions", type=int, default=10, help="number of concurrent sessions")
+    parser.add_argument("--actions", type=int, default=50, help="interactions per session")
+    parser.add_argument("--think-time", type=float, default=0.5, help="max seconds between interactions")
+    parser.add_argument("--port", type=int, default=8061)
+    parser.add_argument("--url", help="use an already running app instead of starting one (RSS is not reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        base_url, pid = args.url.rstrip("/"), None
+    else:
+        proc, base_url = start_server(args.port)
+        pid = proc.pid
+
+    results = []
+    lock = threading.Lock()
+    try:
+        current_figure_version = figure_version(base_url)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            futures = [
+                pool.submit(run_session, session_id, base_url, pid, current_figure_version, args.actions,
+                            args.think_time, args.seed, results, lock)
+                for session_id in range(args.sessions)
+            ]
+        # A session that raised would otherwise just be missing from the results
+        session_errors = []
+        for session_id, future in enumerate(futures):
+            try:
+                future.result()
+            except Exception as e:
+                session_errors.append((session_id, e))
+        wall_time = time.perf_counter() - start
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+            print(f"Server log: {proc.log_path}")
+
+    summarize(results, wall_time)
+    if session_errors:
+        for session_id, e in session_errors:
+            print(f"Session {session_id} aborted: {e!r}")
+        sys.exit(f"{len(session_errors)} of {args.sessions} sessions aborted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+
+class MetricRank:
+    # Sorted view of one metric, built once so lookups never sort at request time.
+    # Rank 1 is the highest value; countries without a value are left out.
+
+    def __init__(self, df, metric):
+        values = (
+            df[["ISO3", "Country", metric]]
+            .dropna(subset=["ISO3"])
+            .drop_duplicates(subset=["ISO3"])
+        )
+        numeric = pd.to_numeric(values[metric], errors="coerce").to_numpy(dtype=float)
+        valid = ~np.isnan(numeric)
+
+        order = np.argsort(numeric[valid], kind="stable")
+        self.metric = metric
+        self.values = numeric[valid][order]                       # ascending
+        self.iso3 = values["ISO3"].to_numpy()[valid][order]
+        self.names = values["Country"].to_numpy()[valid][order]
+        self.n = len(self.values)
+
+        # Ties share the best rank; percentile is the share of countries at or below the value
+        above = self.n - np.searchsorted(self.values, self.values, side="right")
+        at_or_below = np.searchsorted(self.values, self.values, side="right")
+        self.percentiles = 100 * at_or_below / max(self.n, 1)     # ascending, equal for ties
+        self._lookup = {
+            iso: (int(above[i]) + 1, float(self.percentiles[i]), float(self.values[i]), self.names[i])
+            for i, iso in enumerate(self.iso3)
+        }
+
+    def rank(self, iso):
+        # O(1): {"rank", "of", "percentile", "value", "country"} or None if the country has no value
+        if iso not in self._lookup:
+            return None
+        rank, percentile, value, name = self._lookup[iso]
+        return {"rank": rank, "of": self.n, "percentile": percentile, "value": value, "country": name}
+
+    def percentile_of(self, value):
+        # O(log n): where an arbitrary value would stand
+        if self.n == 0:
+            return None
+        return 100 * np.searchsorted(self.values, value, side="right") / self.n
+
+    def top(self, n=5):
+        return self._rows(np.arange(self.n - 1, max(self.n - n, 0) - 1, -1))
+
+    def bottom(self, n=5):
+        return self._rows(slice(0, n))
+
+    def between(self, p1, p2):
+        # Countries whose at-or-below percentile lies in [p1, p2], lowest first; tied values
+        # share a percentile, so they are always all in or all out
+        lo = np.searchsorted(self.percentiles, p1, side="left")
+        hi = np.searchsorted(self.percentiles, p2, side="right")
+        return self._rows(slice(lo, hi))
+
+    def _rows(self, positions):
+        return [
+            {"ISO3": iso, "country": name, "value": float(value)}
+            for iso, name, value in zip(self.iso3[positions], self.names[positions], self.values[positions])
+        ]
+
+
+def build_rank_index(datasets):
+    # {(dataset name, metric): MetricRank} for every numeric column
+    index = {}
+    for dataset_name, df in datasets.items():
+        if df.empty or "ISO3" not in df.columns:
+            continue
+        for metric in df.select_dtypes(include="number").columns:
+            index[(dataset_name, metric)] = MetricRank(df, metric)
+    return index
@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+import country_converter as coco
+
+# Rollup levels from finest to coarsest, with the dropdown labels
+LEVELS = {
+    "country": "Country",
+    "subregion": "Sub-region",
+    "continent": "Continent",
+    "world": "World"
+}
+
+# How every metric is rolled up to a region:
+#   sum         counts, volumes, money and areas
+#   population  population-weighted mean of per-person values, rates and shares of people
+#   area        land-area-weighted mean of shares of the land area
+#   agri_area   agricultural-area-weighted mean of shares of the agricultural land
+#   max / min   extremes, such as elevations
+#   none        not comparable across countries (exchange rates are in different currencies)
+AGGREGATION = {
+    # energy
+    "electricity_access_percent": "population",
+    "electricity_generating_capacity_kW": "sum",
+    "coal_metric_tons": "sum",
+    "petroleum_bbl_per_day": "sum",
+    "refined_petroleum_products_bbl_per_day": "sum",
+    "refined_petroleum_exports_bbl_per_day": "sum",
+    "refined_petroleum_imports_bbl_per_day": "sum",
+    "natural_gas_cubic_meters": "sum",
+    "carbon_dioxide_emissions_Mt": "sum",
+    # communications
+    "telephone_fixed_subscriptions_total": "sum",
+    "mobile_cellular_subscriptions_total": "sum",
+    "internet_users_total": "sum",
+    "broadband_fixed_subscriptions_total": "sum",
+    # geography
+    "Area_Total": "sum",
+    "Land_Area": "sum",
+    "Water_Area": "sum",
+    "Land_Boundaries": "sum",
+    "Coastline": "sum",
+    "Highest_Elevation": "max",
+    "Lowest_Elevation": "min",
+    "Forest_Land": "area",
+    "Other_Land": "area",
+    "Agricultural_Land": "area",
+    "Arable_Land (percentage of Total Agricultural Land)": "agri_area",
+    "Permanent_Crops (percentage of Total Agricultural Land)": "agri_area",
+    "Permanent_Pasture (percentage of Total Agricultural Land)": "agri_area",
+    "Irrigated_Land": "sum",
+    # government
+    "Suffrage_Age": "population",
+    # transportation
+    "airports_paved_runways_count": "sum",
+    "airports_unpaved_runways_count": "sum",
+    "heliports_count": "sum",
+    "roadways_km": "sum",
+    "railways_km": "sum",
+    "waterways_km": "sum",
+    "gas_pipelines_km": "sum",
+    "oil_pipelines_km": "sum",
+    "refined_products_pipelines_km": "sum",
+    "water_pipelines_km": "sum",
+    # demographics
+    "Total_Population": "sum",
+    "Population_Growth_Rate": "population",
+    "Birth_Rate": "population",
+    "Death_Rate": "population",
+    "Net_Migration_Rate": "population",
+    "Median_Age": "population",
+    "Sex_Ratio": "population",
+    "Infant_Mortality_Rate": "population",
+    "Total_Fertility_Rate": "population",
+    "Total_Literacy_Rate": "population",
+    "Male_Literacy_Rate": "population",
+    "Female_Literacy_Rate": "population",
+    "Youth_Unemployment_Rate": "population",
+    # economy
+    "Real_GDP_PPP_billion_USD": "sum",
+    "GDP_Official_Exchange_Rate_billion_USD": "sum",
+    "Real_GDP_Growth_Rate_percent": "population",
+    "Real_GDP_per_Capita_USD": "population",
+    "Unemployment_Rate_percent": "population",
+    "Youth_Unemployment_Rate_percent": "population",
+    "Budget_billion_USD": "sum",
+    "Budget_Surplus_billion_USD": "sum",
+    "Budget_Deficit_percent_of_GDP": "population",
+    "Public_Debt_percent_of_GDP": "population",
+    "Exports_billion_USD": "sum",
+    "Imports_billion_USD": "sum",
+    "Exchange_Rate_per_USD": "none",
+    "Population_Below_Poverty_Line_percent": "population"
+}
+
+# Columns not in the table: a trailing unit token decides, so "Rate" inside
+# "..._Exchange_Rate_billion_USD" or "age" inside "percentage" never matches
+MEAN_SUFFIXES = ("percent", "percentage", "rate", "ratio", "age", "capita")
+
+HOW_LABELS = {
+    "sum": "sum",
+    "population": "population-weighted mean",
+    "area": "area-weighted mean",
+    "agri_area": "agricultural-area-weighted mean",
+    "max": "max",
+    "min": "min"
+}
+
+# country_converter echoes unknown names back when not_found=None, so use an explicit marker
+NOT_FOUND = "not found"
+
+
+def default_how(metric):
+    if metric in AGGREGATION:
+        return AGGREGATION[metric]
+    return "population" if metric.lower().rsplit("_", 1)[-1] in MEAN_SUFFIXES else "sum"
+
+
+class RegionHierarchy:
+    # country -> sub-region -> continent -> world, with every kind of aggregate in HOW_LABELS
+    # precomputed for every numeric metric at every level
+
+    def __init__(self, datasets, population_dataset="demographics", population_metric="Total_Population",
+                 area_dataset="geography", area_metric="Land_Area", agri_share_metric="Agricultural_Land"):
+        names = pd.concat([
+            df[[c for c in ("Country", "ISO3") if c in df.columns]]
+            for df in datasets.values() if not df.empty and "Country" in df.columns
+        ])
+        if "ISO3" not in names.columns:
+            names["ISO3"] = None
+        names = names.groupby("Country")["ISO3"].first().reset_index()
+
+        # Reuse the ISO3 codes the app already resolved; only the remaining names go through coco
+        cc = coco.CountryConverter()
+        missing = names["ISO3"].isna()
+        if missing.any():
+            converted = cc.convert(names=names.loc[missing, "Country"].tolist(), to="ISO3", not_found=NOT_FOUND)
+            names.loc[missing, "ISO3"] = converted if isinstance(converted, list) else [converted]
+        names = names.replace({"ISO3": {NOT_FOUND: np.nan}}).dropna(subset=["ISO3"])
+
+        # One converter call per level for all countries; pseudo-entities such as WORLD or
+        # EUROPEAN UNION have no ISO3 / region and drop out here
+        countries = names.drop_duplicates(subset=["ISO3"]).set_index("ISO3")
+        iso_list = countries.index.tolist()
+        countries["subregion"] = cc.convert(names=iso_list, src="ISO3", to="UNregion", not_found=NOT_FOUND)
+        countries["continent"] = cc.convert(names=iso_list, src="ISO3", to="continent", not_found=NOT_FOUND)
+        countries = countries[(countries["subregion"] != NOT_FOUND) & (countries["continent"] != NOT_FOUND)]
+        countries = countries.assign(world="World")
+        self.countries = countries
+        self.country_names = names.set_index("Country")["ISO3"]
+
+        def country_series(dataset_name, metric):
+            # One value per country in the hierarchy, NaN where missing
+            df = datasets.get(dataset_name)
+            if df is None or metric not in df.columns:
+                return pd.Series(np.nan, index=countries.index)
+            df = df.assign(ISO3=df["Country"].map(self.country_names))
+            return (
+                df.dropna(subset=["ISO3"]).drop_duplicates(subset=["ISO3"])
+                .set_index("ISO3")[metric].astype(float).reindex(countries.index)
+            )
+
+        land_area = country_series(area_dataset, area_metric)
+        weights = {
+            "population": country_series(population_dataset, population_metric),
+            "area": land_area,
+            "agri_area": land_area * country_series(area_dataset, agri_share_metric) / 100
+        }
+
+        # {(dataset, metric): {level: {how: Series}}}
+        self.aggregates = {}
+        for dataset_name, df in datasets.items():
+            if df.empty or "Country" not in df.columns:
+                continue
+            values = df.assign(ISO3=df["Country"].map(self.country_names))
+            values = values.dropna(subset=["ISO3"]).drop_duplicates(subset=["ISO3"]).set_index("ISO3")
+            values = values.select_dtypes(include="number").reindex(countries.index)
+
+            for level in LEVELS:
+                if level == "country":
+                    continue
+                groups = countries[level]
+                by_group = values.groupby(groups)
+                rollups = {
+                    "sum": by_group.sum(min_count=1),
+                    "max": by_group.max(),
+                    "min": by_group.min()
+                }
+                for how, weight in weights.items():
+                    weighted = values.mul(weight, axis=0).groupby(groups).sum(min_count=1)
+                    has_weight = values.notna().mul(weight, axis=0).groupby(groups).sum()
+                    rollups[how] = (weighted / has_weight).replace([np.inf, -np.inf], np.nan)
+                for metric in values.columns:
+                    self.aggregates.setdefault((dataset_name, metric), {})[level] = {
+                        how: frame[metric] for how, frame in rollups.items()
+                    }
+
+    def region_of(self, country_names, level="continent"):
+        # Region of every country name; NaN for names that are not countries
+        return country_names.map(self.country_names).map(self.countries[level])
+
+    def aggregate(self, dataset_name, metric, level, how=None):
+        # Precomputed rollup as a Series indexed by region name; empty for metrics that are not rolled up
+        rollups = self.aggregates[(dataset_name, metric)][level]
+        return rollups.get(how or default_how(metric), pd.Series(dtype=float))
+
+    def rollup_frame(self, dataset_name, metric, level, how=None):
+        # One row per country carrying its region's aggregate, ready for a choropleth
+        groups = self.countries[level]
+        frame = pd.DataFrame({
+            "ISO3": self.countries.index,
+            "Region": groups.to_numpy(),
+            metric: groups.map(self.aggregate(dataset_name, metric, level, how)).to_numpy()
+        })
+        return frame.dropna(subset=[metric])
+
+
+def build_hierarchy(datasets):
+    return RegionHierarchy(datasets)
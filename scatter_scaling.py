@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Above this many points scatters are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = 1_000
+# Above this many points they are binned on the server first
+AGGREGATE_THRESHOLD = 20_000
+BINS = 80
+
+
+def render_mode(n_points):
+    return "webgl" if n_points > WEBGL_THRESHOLD else "svg"
+
+
+def bin_points(df, x, y, by=None, size=None, label="Country", bins=BINS, log_x=False):
+    # 2-D histogram of (x, y), separately for every value of `by` but on shared edges so facets
+    # stay comparable. Returns one row per non-empty bin with the same x/y/by/size/label columns
+    # as the input (x/y are the mean position of the points in the bin, size is summed, label
+    # names the largest member) plus a "points" count, so it can be passed to px.scatter as is.
+    xs = df[x].to_numpy(dtype=float)
+    ys = df[y].to_numpy(dtype=float)
+    bx = np.log10(xs) if log_x else xs
+    if by is not None:
+        group_codes, group_labels = pd.factorize(df[by])
+    else:
+        group_codes, group_labels = np.zeros(len(df), dtype=int), None
+
+    valid = np.isfinite(bx) & np.isfinite(ys) & (group_codes >= 0)
+    bx, ys, group_codes = bx[valid], ys[valid], group_codes[valid]
+    labels = df[label].to_numpy()[valid]
+    sizes = df[size].to_numpy(dtype=float)[valid] if size else np.ones(len(bx))
+    sizes = np.nan_to_num(sizes)
+    if len(bx) == 0:
+        return df.iloc[0:0].assign(points=pd.Series(dtype=int))
+
+    x_edges = np.linspace(bx.min(), bx.max(), bins + 1)
+    y_edges = np.linspace(ys.min(), ys.max(), bins + 1)
+    ix = np.clip(np.searchsorted(x_edges, bx, side="right") - 1, 0, bins - 1)
+    iy = np.clip(np.searchsorted(y_edges, ys, side="right") - 1, 0, bins - 1)
+    key = (group_codes * bins + ix) * bins + iy
+
+    _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+    mean_x = np.bincount(inverse, bx) / counts
+    mean_y = np.bincount(inverse, ys) / counts
+
+    # Largest member of every bin: sort by bin, then by size descending, and take each bin's first row
+    order = np.lexsort((-sizes, inverse))
+    first = order[np.concatenate(([0], np.cumsum(counts)[:-1]))]
+
+    out = pd.DataFrame({
+        x: 10 ** mean_x if log_x else mean_x,
+        y: mean_y,
+        "points": counts,
+        label: [
+            name if n == 1 else f"{name} + {n - 1} more"
+            for name, n in zip(labels[first], counts)
+        ]
+    })
+    if size:
+        out[size] = np.bincount(inverse, sizes)
+    if by is not None:
+        out[by] = np.asarray(group_labels)[group_codes[first]]
+    return out
+
+
+def scale_scatter(df, x, y, by=None, size=None, label="Country", log_x=False):
+    # Data and px.scatter keyword arguments for a scatter of any length: SVG for small frames,
+    # WebGL for larger ones, and binned points beyond AGGREGATE_THRESHOLD
+    options = {"render_mode": render_mode(len(df))}
+    if len(df) > AGGREGATE_THRESHOLD:
+        df = bin_points(df, x, y, by=by, size=size, label=label, log_x=log_x)
+        options["render_mode"] = render_mode(len(df))
+        options["hover_data"] = {"points": True}
+    return df, options
@@ -0,0 +1,6 @@
+import re
+
+
+def metric_slug(metric):
+    # File- and URL-safe name for a metric or category
+    return re.sub(r"[^A-Za-z0-9]+", "_", metric).strip("_").lower()
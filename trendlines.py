@@ -0,0 +1,116 @@
+import numpy as np
+import plotly.graph_objects as go
+
+# Fits keyed by (data version, plot name); the data only changes when the app restarts
+_fit_cache = {}
+
+# Exact two-sided 95% t quantiles for dof 1-5, where the expansion below is off by up to 25%
+T_95_SMALL_DOF = np.array([12.706204736, 4.302652730, 3.182446305, 2.776445105, 2.570581836])
+
+
+def t_quantile(dof, z=1.959963984540054):
+    # Two-sided 95% Student t quantile without scipy: a table for dof <= 5 and the Cornish-Fisher
+    # expansion of the normal quantile above that, accurate to under 0.1% for dof >= 6
+    dof = np.maximum(np.asarray(dof, dtype=float), 1)
+    expansion = (
+        z
+        + (z ** 3 + z) / (4 * dof)
+        + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2)
+        + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3)
+    )
+    small = np.clip(np.round(dof).astype(int), 1, len(T_95_SMALL_DOF)) - 1
+    return np.where(dof <= len(T_95_SMALL_DOF), T_95_SMALL_DOF[small], expansion)
+
+
+def grouped_fit(x, y, groups=None, weights=None, log_x=False):
+    # Weighted least squares y = intercept + slope * x for every group in one pass of bincounts.
+    # Returns {group: {"slope", "intercept", "r2", "n", "x_min", "x_max", ...}}; groups with fewer
+    # than three points or no spread in x are left out.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if log_x:
+        x = np.log10(x)
+    if groups is None:
+        groups = np.zeros(len(x), dtype=int)
+    w = np.ones(len(x)) if weights is None else np.asarray(weights, dtype=float)
+
+    valid = np.isfinite(x) & np.isfinite(y) & np.isfinite(w) & (w > 0)
+    x, y, w = x[valid], y[valid], w[valid]
+    labels, codes = np.unique(np.asarray(groups)[valid], return_inverse=True)
+    k = len(labels)
+
+    n = np.bincount(codes, minlength=k).astype(float)
+    # Rescale weights to sum to n per group so the residual variance is on the scale of the data
+    w = w * (n / np.bincount(codes, w, minlength=k))[codes]
+
+    x_mean = np.bincount(codes, w * x, minlength=k) / n
+    y_mean = np.bincount(codes, w * y, minlength=k) / n
+    dx = x - x_mean[codes]
+    dy = y - y_mean[codes]
+    sxx = np.bincount(codes, w * dx * dx, minlength=k)
+    sxy = np.bincount(codes, w * dx * dy, minlength=k)
+    syy = np.bincount(codes, w * dy * dy, minlength=k)
+
+    x_min = np.full(k, np.inf)
+    x_max = np.full(k, -np.inf)
+    np.minimum.at(x_min, codes, x)
+    np.maximum.at(x_max, codes, x)
+
+    fits = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        r2 = np.where(syy > 0, sxy ** 2 / (sxx * syy), 0.0)
+        residual_var = (syy - slope * sxy) / (n - 2)
+    t = t_quantile(n - 2)
+
+    for i, label in enumerate(labels):
+        if n[i] < 3 or not sxx[i] > 0:
+            continue
+        fits[label] = {
+            "slope": float(slope[i]),
+            "intercept": float(intercept[i]),
+            "r2": float(r2[i]),
+            "n": int(n[i]),
+            "x_mean": float(x_mean[i]),
+            "sxx": float(sxx[i]),
+            "residual_var": float(max(residual_var[i], 0.0)),
+            "t": float(t[i]),
+            "x_min": float(x_min[i]),
+            "x_max": float(x_max[i]),
+            "log_x": log_x
+        }
+    return fits
+
+
+def cached_fit(cache_key, *args, **kwargs):
+    # grouped_fit, memoised on a caller supplied key such as (data version, plot name)
+    if cache_key is None:
+        return grouped_fit(*args, **kwargs)
+    if cache_key not in _fit_cache:
+        _fit_cache[cache_key] = grouped_fit(*args, **kwargs)
+    return _fit_cache[cache_key]
+
+
+def fit_line(fit, n_points=50):
+    # Fitted line and 95% confidence band of the mean, sampled over the group's x range
+    xs = np.linspace(fit["x_min"], fit["x_max"], n_points)
+    ys = fit["intercept"] + fit["slope"] * xs
+    half_width = fit["t"] * np.sqrt(fit["residual_var"] * (1 / fit["n"] + (xs - fit["x_mean"]) ** 2 / fit["sxx"]))
+    if fit["log_x"]:
+        xs = 10 ** xs
+    return xs, ys, ys - half_width, ys + half_width
+
+
+def trendline_traces(fit, color, name, xaxis="x", yaxis="y", showlegend=False):
+    # Band (lower edge + filled upper edge) and the line itself as plain scatter traces
+    xs, ys, lower, upper = fit_line(fit)
+    hover = f"{name}<br>slope={fit['slope']:.3g}<br>R²={fit['r2']:.2f}<br>n={fit['n']}<extra></extra>"
+    return [
+        go.Scatter(x=xs, y=lower, mode="lines", line=dict(width=0, color=color), hoverinfo="skip",
+                   showlegend=False, xaxis=xaxis, yaxis=yaxis),
+        go.Scatter(x=xs, y=upper, mode="lines", line=dict(width=0, color=color), fill="tonexty",
+                   fillcolor=color, opacity=0.2, hoverinfo="skip", showlegend=False, xaxis=xaxis, yaxis=yaxis),
+        go.Scatter(x=xs, y=ys, mode="lines", line=dict(width=2, color=color), name=f"{name} trend",
+                   hovertemplate=hover, showlegend=showlegend, xaxis=xaxis, yaxis=yaxis)
+    ]
@@ -0,0 +1,294 @@
+import argparse
+import json
+import math
+import os
+import re
+
+import numpy as np
+import plotly.colors as pc
+from flask import Response, jsonify, request
+
+from slugs import metric_slug
+
+# shapely and mapbox-vector-tile are only needed to build the pyramid, not to serve it
+try:
+    import mapbox_vector_tile
+    from shapely.geometry import box, mapping, shape
+    from shapely.ops import transform
+except ImportError:
+    mapbox_vector_tile = None
+
+TILE_DIR = "tiles"
+# Public origin the tiles are served from (e.g. behind a reverse proxy); relative URLs when unset
+PUBLIC_BASE_URL = os.environ.get("PUBLIC_BASE_URL", "").rstrip("/")
+EXTENT = 4096
+BUFFER = 64          # tile units kept outside each tile edge so fills have no seams
+N_BINS = 7
+COLOR_SCALE = "Sunset"
+WORLD_SIZE = 2 * math.pi * 6378137
+MAX_LAT = 85.0511287798
+CLICK_TOLERANCE = 0.2  # degrees; the click outlines are invisible so coarse shapes are enough
+VERSION_PATTERN = r"[0-9a-f]+"
+SLUG_PATTERN = r"[a-z0-9_]+"
+
+
+def to_mercator(lon, lat):
+    lon = np.asarray(lon, dtype=float)
+    lat = np.clip(np.asarray(lat, dtype=float), -MAX_LAT, MAX_LAT)
+    x = lon * WORLD_SIZE / 360
+    y = np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * WORLD_SIZE / (2 * np.pi)
+    return x, y
+
+
+def tile_bounds(z, x, y):
+    # Web Mercator bounds of tile z/x/y (y counted from the top, as in the XYZ scheme)
+    size = WORLD_SIZE / 2 ** z
+    minx = -WORLD_SIZE / 2 + x * size
+    maxy = WORLD_SIZE / 2 - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def tile_range(bounds, z):
+    # XYZ tiles touched by the mercator bounds (minx, miny, maxx, maxy) at zoom z
+    n = 2 ** z
+    size = WORLD_SIZE / n
+    minx, miny, maxx, maxy = bounds
+    x0 = max(int((minx + WORLD_SIZE / 2) // size), 0)
+    x1 = min(int((maxx + WORLD_SIZE / 2) // size), n - 1)
+    y0 = max(int((WORLD_SIZE / 2 - maxy) // size), 0)
+    y1 = min(int((WORLD_SIZE / 2 - miny) // size), n - 1)
+    return range(x0, x1 + 1), range(y0, y1 + 1)
+
+
+# -------------------------------------------------
+# Offline pyramid build
+# -------------------------------------------------
+def build_metric_tiles(df, metric, geojson, data_version, tile_dir=TILE_DIR, max_zoom=5):
+    if mapbox_vector_tile is None:
+        raise ImportError("Building vector tiles requires the 'shapely' and 'mapbox-vector-tile' packages")
+
+    values = (
+        df[["ISO3", "Country", metric]]
+        .dropna()
+        .drop_duplicates(subset=["ISO3"])
+        .set_index("ISO3")
+    )
+    if values.empty:
+        return None
+
+    # Quantile bins, one colour per bin; each bin becomes its own layer inside the tiles
+    edges = np.unique(np.quantile(values[metric], np.linspace(0, 1, N_BINS + 1)))
+    n_bins = max(len(edges) - 1, 1)
+    colors = pc.sample_colorscale(COLOR_SCALE, [i / max(n_bins - 1, 1) for i in range(n_bins)])
+    bin_of = np.clip(np.searchsorted(edges, values[metric], side="right") - 1, 0, n_bins - 1)
+    values["bin"] = bin_of
+
+    features = []
+    for feature in geojson["features"]:
+        iso = feature.get("id")
+        if iso not in values.index:
+            continue
+        geom = transform(to_mercator, shape(feature["geometry"]))
+        if not geom.is_valid:
+            geom = geom.buffer(0)
+        row = values.loc[iso]
+        features.append((geom, {"iso3": iso, "name": row["Country"], "value": float(row[metric])}, int(row["bin"])))
+
+    # Pyramids live under the data version they were built from, so a data change never serves old tiles
+    out_dir = os.path.join(tile_dir, data_version, metric_slug(metric))
+    tile_count = 0
+    for z in range(max_zoom + 1):
+        tile_size = WORLD_SIZE / 2 ** z
+        tolerance = tile_size / EXTENT
+        margin = tile_size * BUFFER / EXTENT
+
+        # Assign every feature to the tiles its bounding box touches
+        tiles = {}
+        for geom, props, bin_index in features:
+            simplified = geom.simplify(tolerance, preserve_topology=True)
+            xs, ys = tile_range(simplified.bounds, z)
+            for x in xs:
+                for y in ys:
+                    tiles.setdefault((x, y), []).append((simplified, props, bin_index))
+
+        for (x, y), members in tiles.items():
+            minx, miny, maxx, maxy = tile_bounds(z, x, y)
+            clip = box(minx - margin, miny - margin, maxx + margin, maxy + margin)
+            layers = {}
+            for geom, props, bin_index in members:
+                clipped = geom.intersection(clip)
+                if clipped.is_empty:
+                    continue
+                layers.setdefault(bin_index, []).append({"geometry": clipped, "properties": props})
+            if not layers:
+                continue
+
+            tile = mapbox_vector_tile.encode(
+                [{"name": f"bin{i}", "features": feats} for i, feats in sorted(layers.items())],
+                default_options={"quantize_bounds": (minx, miny, maxx, maxy), "extents": EXTENT}
+            )
+            path = os.path.join(out_dir, str(z), str(x))
+            os.makedirs(path, exist_ok=True)
+            with open(os.path.join(path, f"{y}.pbf"), "wb") as f:
+                f.write(tile)
+            tile_count += 1
+
+    manifest = {
+        "metric": metric,
+        "slug": metric_slug(metric),
+        "data_version": data_version,
+        "max_zoom": max_zoom,
+        "edges": edges.tolist(),
+        "colors": colors,
+        "min": float(values[metric].min()),
+        "max": float(values[metric].max()),
+        "tiles": tile_count
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def build_click_shapes(geojson, data_version, tile_dir=TILE_DIR):
+    # Coarse country outlines sent with tile-mode figures as an invisible choropleth, so a click
+    # anywhere inside a country selects it
+    features = []
+    for feature in geojson["features"]:
+        geom = shape(feature["geometry"]).simplify(CLICK_TOLERANCE, preserve_topology=True)
+        if geom.is_empty:
+            continue
+        coords = json.loads(json.dumps(mapping(geom)["coordinates"]), parse_float=lambda v: round(float(v), 2))
+        features.append({"type": "Feature", "id": feature.get("id"),
+                         "geometry": {"type": geom.geom_type, "coordinates": coords}})
+    out_dir = os.path.join(tile_dir, data_version)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "click_shapes.json"), "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f, separators=(",", ":"))
+    return len(features)
+
+
+def load_manifests(data_version, tile_dir=TILE_DIR):
+    # metric name -> manifest for every pyramid built from the current data; pyramids from
+    # other data versions are ignored
+    manifests = {}
+    version_dir = os.path.join(tile_dir, data_version)
+    if not os.path.isdir(version_dir):
+        return manifests
+    for slug in os.listdir(version_dir):
+        path = os.path.join(version_dir, slug, "manifest.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest.get("data_version") == data_version:
+                manifests[manifest["metric"]] = manifest
+    return manifests
+
+
+def load_click_shapes(data_version, tile_dir=TILE_DIR):
+    path = os.path.join(tile_dir, data_version, "click_shapes.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def discrete_colorscale(manifest):
+    # Stepped colorscale with the same quantile bins as the tile fills, so the colorbar matches the map
+    edges, colors = manifest["edges"], manifest["colors"]
+    span = manifest["max"] - manifest["min"]
+    if span <= 0 or len(edges) < 2:
+        return [[0, colors[0]], [1, colors[0]]]
+    scale = []
+    for i, color in enumerate(colors):
+        lo = (edges[i] - manifest["min"]) / span
+        hi = (edges[i + 1] - manifest["min"]) / span
+        scale += [[lo, color], [hi, color]]
+    return scale
+
+
+# -------------------------------------------------
+# Serving
+# -------------------------------------------------
+def register_tile_routes(server, tile_dir=TILE_DIR):
+    tile_dir = os.path.abspath(tile_dir)
+
+    def valid(version, slug):
+        return re.fullmatch(VERSION_PATTERN, version) and re.fullmatch(SLUG_PATTERN, slug)
+
+    @server.route("/tiles/<version>/<slug>/tiles.json")
+    def tilejson(version, slug):
+        if not valid(version, slug):
+            return Response(status=404)
+        path = os.path.join(tile_dir, version, slug, "manifest.json")
+        if not os.path.exists(path):
+            return Response(status=404)
+        with open(path) as f:
+            manifest = json.load(f)
+        # TileJSON lets mapbox over-zoom past max_zoom instead of requesting missing tiles.
+        # Tile URLs must be absolute (mapbox fetches them from a worker), so without a configured
+        # public base the response depends on the Host header and must not be shared across hosts.
+        response = jsonify({
+            "tilejson": "2.2.0",
+            "name": manifest["metric"],
+            "tiles": [f"{PUBLIC_BASE_URL or request.host_url.rstrip('/')}/tiles/{version}/{slug}/{{z}}/{{x}}/{{y}}.pbf"],
+            "minzoom": 0,
+            "maxzoom": manifest["max_zoom"]
+        })
+        if not PUBLIC_BASE_URL:
+            response.headers["Vary"] = "Host"
+        return response
+
+    @server.route("/tiles/<version>/<slug>/<int:z>/<int:x>/<int:y>.pbf")
+    def vector_tile(version, slug, z, x, y):
+        if not valid(version, slug):
+            return Response(status=404)
+        path = os.path.join(tile_dir, version, slug, str(z), str(x), f"{y}.pbf")
+        # Tiles without any country (open ocean) are not written; an empty body is a valid empty tile
+        data = b""
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+        response = Response(data, mimetype="application/x-protobuf")
+        # The data version is part of the URL, so a tile never changes once served
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+def tile_layers(manifest, opacity=0.75):
+    # One mapbox fill layer per colour bin, all reading the same tile source. The source URL is
+    # relative unless PUBLIC_BASE_URL is set, so figure bodies never depend on the request's host.
+    source = f"{PUBLIC_BASE_URL}/tiles/{manifest['data_version']}/{manifest['slug']}/tiles.json"
+    return [
+        {
+            "sourcetype": "vector",
+            "source": source,
+            "sourcelayer": f"bin{i}",
+            "type": "fill",
+            "color": color,
+            "opacity": opacity,
+            "below": "traces"
+        }
+        for i, color in enumerate(manifest["colors"])
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the vector-tile pyramid for every dashboard metric.")
+    parser.add_argument("--max-zoom", type=int, default=5)
+    parser.add_argument("--tile-dir", default=TILE_DIR)
+    args = parser.parse_args()
+
+    from app import DATA_VERSION, datasets, category_mapping, geojson
+
+    print(f"{build_click_shapes(geojson, DATA_VERSION, args.tile_dir)} click outlines")
+    built = set()
+    for sections in category_mapping.values():
+        for section in sections:
+            df = datasets.get(section["dataset"])
+            for metric in section["metrics"]:
+                if df is None or metric not in df.columns or metric in built:
+                    continue
+                built.add(metric)
+                manifest = build_metric_tiles(df, metric, geojson, DATA_VERSION, args.tile_dir, args.max_zoom)
+                if manifest:
+                    print(f"{metric:<55} {manifest['tiles']:>6} tiles")
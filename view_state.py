@@ -0,0 +1,79 @@
+import glob
+import hashlib
+import json
+import os
+from urllib.parse import urlencode
+
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+# Values that are left out of the URL because they are what the page starts with
+DEFAULTS = {"dataset": "choose_dataset", "category": "choose_category", "iso": None, "level": "country"}
+
+# The map figure does not depend on the dataset dropdown, so it is keyed on fewer fields
+FIGURE_KEYS = ("category", "iso", "level")
+
+
+def canonical_state(args, datasets, categories, isos, levels):
+    # Drop unknown keys, invalid values and defaults so every view has exactly one spelling
+    state = {}
+    dataset = args.get("dataset")
+    if dataset in datasets and dataset != DEFAULTS["dataset"]:
+        state["dataset"] = dataset
+    category = args.get("category")
+    if category in categories and category != DEFAULTS["category"]:
+        state["category"] = category
+    iso = (args.get("iso") or "").upper()
+    if iso in isos:
+        state["iso"] = iso
+    level = args.get("level")
+    if level in levels and level != DEFAULTS["level"]:
+        state["level"] = level
+    return state
+
+
+def figure_state(state):
+    return {key: state[key] for key in FIGURE_KEYS if key in state}
+
+
+def encode_state(state):
+    # Sorted keys so the same state always produces byte-identical query strings
+    return urlencode(sorted(state.items()))
+
+
+def data_version(datasets):
+    # Short content hash of the loaded data; part of every figure URL so caches never go stale
+    digest = hashlib.sha256()
+    for name in sorted(datasets):
+        digest.update(name.encode())
+        digest.update(pd.util.hash_pandas_object(datasets[name], index=True).values.tobytes())
+    return digest.hexdigest()[:12]
+
+
+def build_id():
+    # BUILD_ID from the deployment if set, otherwise a hash of the app's own code and assets
+    if os.environ.get("BUILD_ID"):
+        return os.environ["BUILD_ID"]
+    root = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(root, "*.py")) + glob.glob(os.path.join(root, "assets", "*.js"))):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def figure_version(data_version, tile_manifests):
+    # Version in the figure URLs: changes with the data, the tile pyramids in use and the code
+    # that builds the figures, so an immutable cached figure is never served for a different build
+    digest = hashlib.sha256()
+    digest.update(data_version.encode())
+    digest.update(json.dumps(tile_manifests, sort_keys=True).encode())
+    digest.update(build_id().encode())
+    return digest.hexdigest()[:12]
+
+
+def figure_body(fig):
+    # Deterministic JSON for a figure, with its content hash for the ETag
+    body = json.dumps(fig.to_plotly_json(), cls=PlotlyJSONEncoder, sort_keys=True, separators=(",", ":"))
+    body = body.encode()
+    return body, hashlib.sha256(body).hexdigest()[:16]